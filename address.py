@@ -1,5 +1,6 @@
 import re, json, pprint
 from collections import OrderedDict
+from timeit import default_timer
 from address_parser import AddressParser
 from __util__ import *
 
@@ -51,17 +52,43 @@ class Address:
     comma_separated_address = []
     last_matched = None
     issues = []
+    guarded = False # True when the input tripped the parser's size limits and was truncated
     
     def __init__(self, address, parser=None, logger=None):
         ''''''
-        self.original = to_utf8(address)
+        self.native_text = parser.native_text if parser is not None else False
+        self.text_type = type(address) if address is not None else str
+        self.original = self.to_utf8(address)
         self.parser = parser
+        # pin the reference data so a reload part way through doesn't change the tables under us
+        self.reference = parser.reference if parser else None
         self.logger = logger
         self.blind_guess = {}
+        self.issues = []
+        self.unmatched_list = []
+        # which blind guesses we fell back on and which secondary designator regexes fired, for ParseMetrics
+        self.fallbacks = []
+        self.matched_regexes = []
         
         if address is None: return 
         
-        self.parse_address(self.preprocess_address(address))
+        recorder = parser.slow_inputs if parser is not None else None
+        if recorder is None:
+            guarded = self.apply_guard(address)
+            # input guarded down to nothing skips parsing but is still counted below
+            if guarded: self.parse_address(self.preprocess_address(guarded))
+        else:
+            start = default_timer()
+            guarded = self.apply_guard(address)
+            guarded_at = preprocessed_at = end = default_timer()
+            if guarded:
+                preprocessed = self.preprocess_address(guarded)
+                preprocessed_at = default_timer()
+                self.parse_address(preprocessed)
+                end = default_timer()
+            # record what we were given, not what the guard left, so the outlier can be replayed as it was
+            recorder.record(address, {'guard': guarded_at - start, 'preprocess': preprocessed_at - guarded_at,
+                                      'parse': end - preprocessed_at, 'total': end - start})
         
         # It is prefectly valid for an address to not have a house number
         if self.primary_number is None or self.primary_number <= 0:
@@ -69,6 +96,22 @@ class Address:
             
         if self.street_name is None or self.street_name == '':
             self.issues.append('Street name could not be determined')
+        
+        if parser is not None and parser.metrics is not None:
+            parser.metrics.record(self)
+    
+    def to_utf8(self, item):
+        '''
+        Components are utf-8 encoded as they are set, unless the parser is in native_text mode. Then they keep
+        whatever text type the address was given in. Tokens from the address already are that type, so only values
+        from the reference tables are ever converted, and only when the address was given as unicode.
+        '''
+        if self.native_text:
+            if not item: return None
+            if type(item) is not self.text_type:
+                item = item.decode('utf-8') if self.text_type is unicode else item.encode('utf-8')
+            return item
+        return to_utf8(item)
     
     def parse_address(self, address):
         ''''''
@@ -138,10 +181,10 @@ class Address:
                 self.plus4_code = self.to_utf8(token.split('-')[-1])
                 return True
             if len(token) == 5 and re.match(r'\d{5}', token):
-                self.zip_code = to_utf8(token)
-                if self.parser.zip_codes.has_key(self.zip_code):
-                    self.blind_guess['city_name'] = self.parser.zip_codes[self.zip_code]['city_name']
-                    self.blind_guess['state'] = self.parser.zip_codes[self.zip_code]['state']
+                self.zip_code = self.to_utf8(token)
+                if self.reference.zip_codes.has_key(self.zip_code):
+                    self.blind_guess['city_name'] = self.reference.zip_codes[self.zip_code]['city_name']
+                    self.blind_guess['state'] = self.reference.zip_codes[self.zip_code]['state']
                 return True                
         return False
     
@@ -150,59 +193,62 @@ class Address:
         shortened_cities = {'saint': 'st.'}
         # blind guess logic is going to fill the state more times than not. lets handle here
         if self.city_name is None and self.state_abbreviation is not None and self.street_suffix is None:
-            if token.lower() in self.parser.cities:
+            if token.lower() in self.reference.cities:
                 if len(token.split()) == 1:
                     if self.blind_guess.has_key('city_name'):
                         if len(self.blind_guess['city_name'].split()) == 1:
-                            self.city_name = to_utf8(cap_words(token))
+                            self.city_name = self.to_utf8(cap_words(token))
                             return True
                         elif len(self.blind_guess['city_name'].split()) == 2:
                             # this city name is comming from a zip look up so i trust it more than the parsing logic
-                            self.city_name = self.blind_guess['city_name']
+                            self.city_name = self.to_utf8(self.blind_guess['city_name'])
+                            self.fallbacks.append('city_name')
                             return True
                     else:
-                        self.city_name = to_utf8(cap_words(token))
+                        self.city_name = self.to_utf8(cap_words(token))
             elif self.blind_guess.has_key('city_name'):
-                self.city_name = to_utf8(self.blind_guess['city_name'])
+                self.city_name = self.to_utf8(self.blind_guess['city_name'])
+                self.fallbacks.append('city_name')
                 return True
             return False
         # check that we are in the correct location and that we have at least one comma in the address
         if self.city_name is None and self.secondary_designator is None and self.street_suffix is None and len(self.comma_separated_address) > 1:
-            if token.lower() in self.parser.cities:
-                self.city_name = to_utf8(cap_words(token))
+            if token.lower() in self.reference.cities:
+                self.city_name = self.to_utf8(cap_words(token))
                 return True
             return False
         # Multi word cities
         if self.city_name is not None and self.street_suffix is None and self.street_name is None:
-            if token.lower() + ' ' + self.city_name in self.parser.cities:
-                self.city_name = to_utf8(cap_words(cap_words(token) + ' ' + self.city_name))
+            if token.lower() + ' ' + self.city_name in self.reference.cities:
+                self.city_name = self.to_utf8(cap_words(cap_words(token) + ' ' + self.city_name))
                 return True
             if token.lower() in shortened_cities.keys():
                 token = shortened_cities[token.lower()]
                 print "Checking for shorted multi part city_name", token.lower() + ' ' + self.city_name
-                if token.lower() + ' ' + self.city_name.lower() in self.parser.cities:
-                    self.city_name = to_utf8(cap_words(token) + ' ' + cap_words(self.city_name))
+                if token.lower() + ' ' + self.city_name.lower() in self.reference.cities:
+                    self.city_name = self.to_utf8(cap_words(token) + ' ' + cap_words(self.city_name))
                     return True
     
     def check_state(self, token):
         '''Check if state is in either the keys or values of our states list. Must come before the suffix.'''
         if len(token) == 2 and self.state_abbreviation is None:
             if token.capitalize() in self.parser.states.keys():
-                self.state_abbreviation = to_utf8(self.parser.states[token.capitalize()])
+                self.state_abbreviation = self.to_utf8(self.parser.states[token.capitalize()])
                 return True
             elif token.upper() in self.parser.states.values():
-                self.state_abbreviation = to_utf8(token.upper())
+                self.state_abbreviation = self.to_utf8(token.upper())
                 return True
         if self.state_abbreviation is None and self.street_suffix is None and len(self.comma_separated_address) > 1:
             if token.capitalize() in self.parser.states.keys():
-                self.state_abbreviation = to_utf8(self.parser.states[token.capitalize()])
+                self.state_abbreviation = self.to_utf8(self.parser.states[token.capitalize()])
                 return True
             elif token.upper() in self.parser.states.values():
-                self.state_abbreviation = to_utf8(token.upper())
+                self.state_abbreviation = self.to_utf8(token.upper())
                 return True
         # a blind guess is better than nothing
         if self.state_abbreviation is None and self.blind_guess.has_key('state'):
-            self.state_abbreviation = to_utf8(self.blind_guess['state'])
+            self.state_abbreviation = self.to_utf8(self.blind_guess['state'])
+            self.fallbacks.append('state')
             return True
         return False
     
@@ -213,14 +259,15 @@ class Address:
         '''
         for regex in secondary_designator_regexes:
             if re.match(regex, token.lower()):
-                self.secondary_designator = to_utf8(token)
+                self.secondary_designator = self.to_utf8(token)
+                self.matched_regexes.append(regex)
                 return True
         if self.secondary_designator and token.lower() in ['apt', 'apartment']:
-            self.secondary_designator = to_utf8(token + ' ' + self.secondary_designator)
+            self.secondary_designator = self.to_utf8(token + ' ' + self.secondary_designator)
             return True
         if not self.street_suffix and not self.street_name and not self.secondary_designator:
             if re.match(r'\d?\w?', token.lower()):
-                self.secondary_designator = to_utf8(token)
+                self.secondary_designator = self.to_utf8(token)
                 return True
         return False
     
@@ -230,12 +277,12 @@ class Address:
         with the first letter capitalized and a period after it. E.g. "St." or "Ave."
         '''
         if self.street_suffix is None and self.street_name is None:
-            if token.upper() in self.parser.suffixes.keys():
-                suffix = self.parser.suffixes[token.upper()]
-                self.street_suffix = to_utf8(suffix.capitalize() + '.')
+            if token.upper() in self.reference.suffixes:
+                suffix = self.reference.suffixes[token.upper()]
+                self.street_suffix = self.to_utf8(suffix.capitalize() + '.')
                 return True
-            elif token.upper() in self.parser.suffixes.values():
-                self.street_suffix = to_utf8(token.capitalize() + '.')
+            elif token.upper() in self.reference.suffix_abbreviations:
+                self.street_suffix = self.to_utf8(token.capitalize() + '.')
                 return True
         return False              
     
@@ -247,14 +294,14 @@ class Address:
         '''
         # first check for single word streets between a prefix and a suffix
         if self.street_name is None and self.street_suffix is not None and self.street_predirection is None and self.primary_number is None:
-            self.street_name = to_utf8(cap_words(token))
+            self.street_name = self.to_utf8(cap_words(token))
             return True
         # now check for multiple word streets. this check must come after the check for street_predirection and primary_number for this reason.
         elif self.street_name is not None and self.street_suffix is not None and self.street_predirection is None and self.primary_number is None:
-            self.street_name = to_utf8(token.capitalize() + ' ' + self.street)
+            self.street_name = self.to_utf8(token.capitalize() + ' ' + self.street)
             return True
-        if not self.street_suffix and not self.street_name and token.lower() in self.parser.streets:
-            self.street_name = to_utf8(token)
+        if not self.street_suffix and not self.street_name and token.lower() in self.reference.streets:
+            self.street_name = self.to_utf8(token)
             return True    
         return False
     
@@ -264,7 +311,7 @@ class Address:
         Standardizes to 1 or two letters, followed by a period.
         '''
         if self.street_name and not self.street_predirection and token.lower().replace('.', '') in self.parser.directionals.keys():
-            self.street_predirection = to_utf8(self.parser.directionals[token.lower().replace('.', '')])
+            self.street_predirection = self.to_utf8(self.parser.directionals[token.lower().replace('.', '')])
             return True
         return False
     
@@ -275,7 +322,7 @@ class Address:
         '''
         if self.street_name and self.primary_number is None and re.match(street_num_regex, token.lower()):
             if self.blind_guess.has_key('primary_number') and token == self.blind_guess['primary_number']:
-                self.primary_number = to_utf8(str(token).upper())
+                self.primary_number = self.to_utf8(str(token).upper())
                 return True
             return True
         return False
@@ -287,9 +334,9 @@ class Address:
         '''
         if self.street_name and self.primary_number:
             if not self.building:
-                self.building = to_utf8(token)
+                self.building = self.to_utf8(token)
             else:
-                self.building = to_utf8(token + ' ' + self.building)
+                self.building = self.to_utf8(token + ' ' + self.building)
             return True
         return False
     
@@ -297,6 +344,8 @@ class Address:
         '''populates dict named blind_guess with assumptions about address placement'''
         # populate the blind_guess with a house number if we can
         addr_parts = address.split()
+        # preprocessing can leave nothing behind, e.g. input that was only secondary designators
+        if not addr_parts: return
         primary_num_placeholder = addr_parts[0]
         try:
             # yeah that's a little ugly but gets the job done
@@ -349,7 +398,7 @@ class Address:
         # is it a house number
         if self.primary_number is None and self.blind_guess.has_key('primary_number'):
             if token == self.blind_guess['primary_number']:
-                self.primary_number = to_utf8(self.blind_guess['primary_number'])
+                self.primary_number = self.to_utf8(self.blind_guess['primary_number'])
                 return True
         # Check if this is an secondary_designator
         if token.lower() in ['apt', 'apartment']:
@@ -363,7 +412,7 @@ class Address:
         # how about a suffixless street
         if self.street_suffix is None and self.street_name is None and self.street_predirection is None and self.primary_number is None:
             if re.match(r'[A-za-z]', token):
-                self.street_name = to_utf8(token.capitalize())
+                self.street_name = self.to_utf8(token.capitalize())
                 return True
         return False
     
@@ -388,6 +437,28 @@ class Address:
     def one_line_usps(self):
         return self.usps_normalized().replace('\n', ' ')
     
+    def apply_guard(self, address):
+        '''
+        Bounds the work done on pathological input before any regex sees it. Input over the parser's limits is
+        split on whitespace, tokens too long to belong to an address are dropped and the rest is cut down to
+        max_tokens and max_address_length, all in linear time. The result is flagged as guarded.
+        '''
+        parser = self.parser
+        tokens = address.split()
+        if len(address) <= parser.max_address_length and len(tokens) <= parser.max_tokens:
+            if all(len(token) <= parser.max_token_length for token in tokens):
+                return address
+        tokens = [token for token in tokens if len(token) <= parser.max_token_length][:parser.max_tokens]
+        length = -1
+        for index, token in enumerate(tokens):
+            length += len(token) + 1
+            if length > parser.max_address_length:
+                tokens = tokens[:index]
+                break
+        self.guarded = True
+        self.issues.append('Input exceeded parse limits and was truncated')
+        return ' '.join(tokens)
+    
     def preprocess_address(self, address):
         '''
         Takes a basic address and attempts to clean it up
@@ -409,22 +480,23 @@ class Address:
                         break
                 if carry_on:
                     # print "Matched regex: ", regex, secondary_designator_match.group()
+                    self.matched_regexes.append(regex)
                     parts = secondary_designator_match.group().split()
-                    self.blind_guess['delivery_line2'] = to_utf8(secondary_designator_match.group())
+                    self.blind_guess['delivery_line2'] = self.to_utf8(secondary_designator_match.group())
                     if len(parts) == 1:
                         for char in parts[0]:
-                            if char == '#': self.secondary_number = to_utf8(parts[0])
+                            if char == '#': self.secondary_number = self.to_utf8(parts[0])
                     elif len(parts) == 2:
                         for part in parts:
                             if part.lower() in secondary_designators:
                                 if parts.index(part) == 0:
-                                    self.secondary_number = to_utf8(parts[1])
-                                    self.secondary_designator = to_utf8(parts[0])
+                                    self.secondary_number = self.to_utf8(parts[1])
+                                    self.secondary_designator = self.to_utf8(parts[0])
                                 elif parts.index(part) == 1:
-                                    self.secondary_number = to_utf8(parts[0])
-                                    self.secondary_designator = to_utf8(parts[1])
+                                    self.secondary_number = self.to_utf8(parts[0])
+                                    self.secondary_designator = self.to_utf8(parts[1])
                     else:
-                        self.secondary_designator = to_utf8(secondary_designator_match.group())
+                        self.secondary_designator = self.to_utf8(secondary_designator_match.group())
                     address = re.sub(regex, "", address, flags=re.IGNORECASE)
             # Now check for things like ",  ,"
         address = re.sub(r"\,\s*\,", ",", address)
@@ -1,15 +1,14 @@
-import csv, os, sys
+import os, sys, threading, time
+from reference_data import ReferenceData, read_zips, read_suffixes, read_names, add_names, add_entries
 cwd = os.path.dirname(os.path.realpath(__file__))
 class AddressParser(object):
     '''
     AddressParser is used to create Address objects. It contains a list of preseeded cities, states, prefixes,
     suffixes, and street names that will help the Address object parse the given string. 
     It's loaded with defaults that work in the average case, but can be adjusted for specific cases.
+    The zip codes, suffixes, cities and streets live in a ReferenceData generation that can be reloaded
+    while the parser is in use.
     '''
-    zip_codes = {}
-    suffixes = {}
-    cities = []
-    streets = []
     directionals = {
         "n": "N.", "e": "E.", "s": "S.", "w": "W.", "ne": "NE.", "nw": "NW.", 'se': "SE.", 'sw': "SW.", 'north': "N.",
         'east': "E.", 'south': "S.",
@@ -27,7 +26,22 @@ class AddressParser(object):
         'Washington': 'WA', 'North Carolina': 'NC', 'District of Columbia': 'DC', 'Texas': 'TX', 'Nevada': 'NV',
         'Maine': 'ME', 'Rhode Island': 'RI'}
     
-    def __init__(self, suffixes=None, cities=None, streets=None, logger=None):
+    # Limits on the work done per address. Anything bigger is truncated in linear time and flagged as guarded
+    # before the regexes in preprocess_address run, since several of them go quadratic on long runs of text.
+    max_address_length = 256
+    max_tokens = 32
+    max_token_length = 64
+    
+    # When True, Address keeps the text type it was given (utf-8 bytes read from a file, or unicode) end to end
+    # instead of encoding every component to utf-8 as it is set. Encode once at the output boundary instead.
+    native_text = False
+    
+    # set to a ParseMetrics to count parse quality across every address this parser produces
+    metrics = None
+    # set to a SlowInputRecorder to keep the slowest inputs this parser has seen
+    slow_inputs = None
+    
+    def __init__(self, suffixes=None, cities=None, streets=None, logger=None, reference=None):
         '''
         suffixes, cities and streets provide a chance to use different lists than the provided lists.
         suffixes is probably good for most users, unless you have some suffixes not recognized by USPS.
@@ -37,19 +51,64 @@ class AddressParser(object):
         Streets can be used to limit the list of possible streets the address are on. It comes blank by default and
         uses positional clues instead. If you are instead just doing a couple cities, a list of all possible streets
         will decrease incorrect street names.       
+        reference swaps out the in memory tables for another provider, such as an SQLiteReferenceData. suffixes,
+        cities and streets are ignored when it is given.
         '''
         self.logger = logger
-        self.load_zips(os.path.join(cwd, 'zipcode.csv'))
+        self._reload_lock = threading.Lock()
+        if reference is not None:
+            self.reference = reference
+            return
+        sources = {'zip_codes': os.path.join(cwd, 'zipcode.csv')}
+        tables = {}
         if suffixes:
-            self.suffixes = suffixes
+            tables['suffixes'] = suffixes
         else:
-            self.load_suffixes(os.path.join(cwd, 'suffixes.csv'))
+            sources['suffixes'] = os.path.join(cwd, 'suffixes.csv')
         if cities:
-            self.cities = cities
+            tables['cities'] = cities
         else:
-            self.load_cities(os.path.join(cwd, 'cities.csv'))
+            sources['cities'] = os.path.join(cwd, 'cities.csv')
         if streets:
-            self.streets = streets
+            tables['streets'] = streets
+        self.reference = ReferenceData.load(sources, **tables)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_reload_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reload_lock = threading.Lock()
+    
+    @property
+    def zip_codes(self):
+        return self.reference.zip_codes
+    
+    @property
+    def suffixes(self):
+        return self.reference.suffixes
+    
+    @suffixes.setter
+    def suffixes(self, suffixes):
+        self.reference = self.reference.replace(suffixes=suffixes)
+    
+    @property
+    def cities(self):
+        return self.reference.cities
+    
+    @cities.setter
+    def cities(self, cities):
+        self.reference = self.reference.replace(cities=cities)
+    
+    @property
+    def streets(self):
+        return self.reference.streets
+    
+    @streets.setter
+    def streets(self, streets):
+        self.reference = self.reference.replace(streets=streets)
     
     def parse_address(self, address):
         '''
@@ -60,16 +119,10 @@ class AddressParser(object):
     
     def load_zips(self, file_name):
         '''
-        Builds a zip code dictionary from csv
+        Adds the zip codes in the csv to the current zip code dictionary and publishes them as a new generation.
         '''
-        with open(file_name) as f:
-            zips = csv.DictReader(f, delimiter=',')
-            for zipcode in zips:
-                self.zip_codes[zipcode['zip']] = {
-                                                    'city_name': zipcode['city'], 
-                                                    'state': zipcode['state']
-                                                 }
-                
+        with self._reload_lock:
+            self.reference = self.reference.replace(zip_codes=add_entries(self.zip_codes, read_zips(file_name)))
     
     def load_suffixes(self, file_name):
         '''
@@ -77,29 +130,172 @@ class AddressParser(object):
         accepted abbreviations. Everything should be stored using the value version, and you can search all
         by using building a set of self.suffixes.keys() and self.suffixes.values().
         '''
-        with open(file_name, 'r') as f:
-            for line in f:
-                # make sure we have key and value
-                if len(line.split(',')) != 2:
-                    continue
-                # strip off newlines
-                self.suffixes[line.strip().split(',')[0]] = line.strip().split(',')[1]
+        with self._reload_lock:
+            self.reference = self.reference.replace(suffixes=add_entries(self.suffixes, read_suffixes(file_name)))
     
     def load_cities(self, file_name):
         '''
         Load up all cities in lowercase for easier matching. The file should have one city name per line, with no extra
         characters. This isn't strictly required, but will vastly increase the accuracy.
         '''
-        with open(file_name, 'r') as f:
-            for line in f:
-                self.cities.append(line.strip().lower())
+        with self._reload_lock:
+            self.reference = self.reference.replace(cities=add_names(self.cities, read_names(file_name)))
     
     def load_streets(self, file_name):
         '''
         Load up all streets in lowercase for easier matching. The file should have one street per line, with no extra
         characters. This isn't strictly required, but will vastly increase the accuracy.
         '''
-        with open(file_name, 'r') as f:
-            for line in f:
-                self.streets.append(line.strip().lower())
+        with self._reload_lock:
+            self.reference = self.reference.replace(streets=add_names(self.streets, read_names(file_name)))
+    
+    def reload(self, zip_file=None, suffix_file=None, city_file=None, street_file=None, measure_memory=True):
+        '''
+        Rebuilds the reference data from disk and swaps it in as a single assignment. Addresses already being
+        parsed keep the generation they started with. Files default to the ones the current generation was read
+        from; tables that were passed in memory are carried over. Returns a dict with the new generation number and
+        the time the rebuild took. With measure_memory it also has the approximate memory held by the old and new
+        generations and by both while they overlap, with carried over tables counted once. Sizes are cached per
+        generation, so each reload only walks the tables it built; pass measure_memory=False to skip even that.
+        '''
+        sources = {}
+        for name, file_name in (('zip_codes', zip_file), ('suffixes', suffix_file),
+                                ('cities', city_file), ('streets', street_file)):
+            if file_name: sources[name] = file_name
+        with self._reload_lock:
+            old = self.reference
+            start = time.time()
+            new = old.reloaded(sources)
+            seconds = time.time() - start
+            self.reference = new
+        stats = {'generation': new.generation, 'seconds': seconds}
+        if not measure_memory:
+            if self.logger:
+                self.logger.info('Reloaded reference data generation %(generation)d in %(seconds).3fs' % stats)
+            return stats
+        stats['old_bytes'] = old.memory_size()
+        stats['new_bytes'] = new.memory_size()
+        stats['overlap_bytes'] = new.shared_memory_size(old)
+        if self.logger:
+            self.logger.info('Reloaded reference data generation %(generation)d in %(seconds).3fs, '
+                             '%(overlap_bytes)d bytes held during overlap' % stats)
+        return stats
+    
+    def reload_in_background(self, callback=None, **files):
+        '''
+        Runs reload on a daemon thread so parsing can carry on while the new generation is built. callback, if
+        given, is called with the reload stats. Returns the started thread.
+        '''
+        def run():
+            stats = self.reload(**files)
+            if callback: callback(stats)
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+    
+    def overlay(self, **layers):
+        '''
+        Return an OverlayParser that layers tenant specific additions and removals over this parser's tables.
+        '''
+        return OverlayParser(self, **layers)
+    
+
+class inherited(object):
+    '''A parser setting an OverlayParser takes from its base, unless it has been set on the overlay itself.'''
+    def __init__(self, name):
+        self.name = name
+    
+    def __get__(self, parser, owner):
+        if parser is None: return self
+        if self.name in parser.__dict__: return parser.__dict__[self.name]
+        return getattr(parser.base, self.name)
+    
+    def __set__(self, parser, value):
+        parser.__dict__[self.name] = value
+    
+    def __delete__(self, parser):
+        parser.__dict__.pop(self.name, None)
+
+def layered_table(name):
+    '''Read-only table property for OverlayParser, whose tables can only change through its layers.'''
+    def get_table(parser):
+        return getattr(parser.reference, name)
+    def set_table(parser, value):
+        raise AttributeError('%s of an OverlayParser are layered over its base; use load_%s, or create a new '
+                             'overlay with %s= and remove_%s=' % (name, name, name, name))
+    return property(get_table, set_table)
+
+class OverlayParser(AddressParser):
+    '''
+    A parser for one tenant that layers a few extra (or removed) suffixes, cities and streets over a shared
+    base parser. The base tables are never copied, so hundreds of overlays can share a single base. When the
+    base reloads, overlays pick up the new generation on their next parse. Settings such as metrics,
+    slow_inputs, native_text and the max_ limits follow the base unless they are set on the overlay.
+    '''
+    metrics = inherited('metrics')
+    slow_inputs = inherited('slow_inputs')
+    native_text = inherited('native_text')
+    max_address_length = inherited('max_address_length')
+    max_tokens = inherited('max_tokens')
+    max_token_length = inherited('max_token_length')
+    
+    suffixes = layered_table('suffixes')
+    cities = layered_table('cities')
+    streets = layered_table('streets')
+    
+    def __init__(self, base, suffixes=None, cities=None, streets=None, remove_suffixes=None, remove_cities=None,
+                 remove_streets=None, logger=None):
+        '''
+        suffixes is a dict of extra long version to abbreviation, cities and streets are lists of extra names.
+        The remove_ arguments list entries of the base that this tenant should not match.
+        '''
+        self.base = base
+        self.logger = logger or base.logger
+        self._reload_lock = threading.Lock()
+        self.layers = {'suffixes': dict(suffixes or {}), 'cities': list(cities or []), 'streets': list(streets or []),
+                       'remove_suffixes': list(remove_suffixes or []), 'remove_cities': list(remove_cities or []),
+                       'remove_streets': list(remove_streets or [])}
+        self._reference = None
+    
+    @property
+    def reference(self):
+        '''The base's current generation with our layers applied, rebuilt whenever the base swaps generations.'''
+        base = self.base.reference
+        current = self._reference
+        if current is None or current.base is not base:
+            current = self._reference = base.overlay(**self.layers)
+        return current
+    
+    def _add_layer(self, name, values):
+        with self._reload_lock:
+            layers = dict(self.layers)
+            if isinstance(values, dict):
+                layer = dict(layers.get(name) or {})
+                layer.update(values)
+            else:
+                layer = list(layers.get(name) or []) + list(values)
+            layers[name] = layer
+            self.layers = layers
+            self._reference = None
+    
+    def load_zips(self, file_name):
+        '''Adds the zip codes in the csv to this tenant's layer.'''
+        self._add_layer('zip_codes', read_zips(file_name))
+    
+    def load_suffixes(self, file_name):
+        '''Adds the suffixes in the file to this tenant's layer.'''
+        self._add_layer('suffixes', read_suffixes(file_name))
+    
+    def load_cities(self, file_name):
+        '''Adds the cities in the file to this tenant's layer.'''
+        self._add_layer('cities', read_names(file_name))
+    
+    def load_streets(self, file_name):
+        '''Adds the streets in the file to this tenant's layer.'''
+        self._add_layer('streets', read_names(file_name))
+    
+    def reload(self, **files):
+        '''Reloads the shared base. Every overlay of the base sees the new generation.'''
+        return self.base.reload(**files)
     
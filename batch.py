@@ -0,0 +1,123 @@
+import csv, json, os
+from address_parser import AddressParser
+from address import Address
+
+component_columns = ['primary_number', 'street_predirection', 'street_name', 'street_postdirection', 'street_suffix',
+                     'secondary_number', 'secondary_designator', 'city_name', 'state_abbreviation', 'zip_code',
+                     'plus4_code']
+counter_names = ('rows', 'with_issues', 'guarded', 'failed')
+
+class CheckpointError(Exception): pass
+
+def tracked_lines(f, position):
+    '''
+    Yields lines from f while keeping position[0] at the byte offset just past the last line handed out. csv.reader
+    only pulls the lines it needs for the next row, so between rows this is exactly where the next row starts.
+    '''
+    while True:
+        line = f.readline()
+        if not line: return
+        position[0] += len(line)
+        yield line
+
+def read_checkpoint(checkpoint_file):
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        with open(checkpoint_file) as f:
+            return json.load(f)
+    return None
+
+def run_identity(input_file, output_file, column):
+    '''What a checkpoint has to match before a run will resume from it.'''
+    info = os.stat(input_file)
+    return {'input_file': os.path.abspath(input_file), 'input_size': info.st_size, 'input_mtime': info.st_mtime,
+            'output_file': os.path.abspath(output_file), 'column': column}
+
+def check_checkpoint(state, identity, checkpoint_file):
+    '''Raise CheckpointError unless the checkpoint belongs to this run and its output is still there.'''
+    for key, value in sorted(identity.items()):
+        if state.get(key) != value:
+            raise CheckpointError('%s was written for a different run (%s was %r, now %r); remove it to start over'
+                                  % (checkpoint_file, key, state.get(key), value))
+    output_file = identity['output_file']
+    if not os.path.exists(output_file):
+        raise CheckpointError('%s exists but %s does not; remove the checkpoint to start over'
+                              % (checkpoint_file, output_file))
+    if os.path.getsize(output_file) < state['output_offset']:
+        raise CheckpointError('%s is shorter than %s says it should be; remove the checkpoint to start over'
+                              % (output_file, checkpoint_file))
+
+def write_checkpoint(checkpoint_file, state, output):
+    '''Make sure the output is on disk first, then replace the checkpoint in one rename.'''
+    output.flush()
+    os.fsync(output.fileno())
+    temp_file = checkpoint_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temp_file, checkpoint_file)
+
+def normalize_csv(input_file, output_file, parser=None, column='address', checkpoint_file=None, checkpoint_every=1000):
+    '''
+    Parses the address in column of every row of input_file and writes the row back out to output_file with the
+    parsed components appended. With a checkpoint_file, the input byte offset, row number, output position and
+    counters are saved every checkpoint_every rows. If the checkpoint exists when called, the run picks up from
+    it: the output is cut back to the checkpointed position and the input is read from the checkpointed offset,
+    so the finished output is byte for byte what an uninterrupted run would have written. Returns the counters.
+    The checkpoint records the input path, size and modification time, the output path and the column; if any of
+    them has changed, or the output has gone missing or shrunk, CheckpointError is raised rather than resuming.
+    Once a run finishes its checkpoint is marked complete, and calling again with it returns the saved counters
+    without reading the input or touching the output.
+    '''
+    parser = parser or AddressParser()
+    state = read_checkpoint(checkpoint_file)
+    identity = run_identity(input_file, output_file, column) if checkpoint_file else None
+    if state is not None:
+        check_checkpoint(state, identity, checkpoint_file)
+        if state.get('complete'):
+            return state['counters']
+    with open(input_file, 'rb') as source:
+        position = [0]
+        reader = csv.reader(tracked_lines(source, position))
+        header = next(reader)
+        index = header.index(column)
+        if state is None:
+            output = open(output_file, 'wb')
+            writer = csv.writer(output)
+            writer.writerow(header + component_columns)
+            state = dict(identity or {})
+            state.update({'input_offset': position[0], 'output_offset': output.tell(),
+                          'counters': dict((name, 0) for name in counter_names)})
+        else:
+            source.seek(state['input_offset'])
+            position[0] = state['input_offset']
+            output = open(output_file, 'r+b')
+            output.seek(state['output_offset'])
+            output.truncate()
+            writer = csv.writer(output)
+        counters = state['counters']
+        try:
+            for row in reader:
+                try:
+                    addr = Address(row[index], parser)
+                    components = addr.components()
+                    values = [components[name] or '' for name in component_columns]
+                    if addr.issues: counters['with_issues'] += 1
+                    if addr.guarded: counters['guarded'] += 1
+                except Exception:
+                    values = [''] * len(component_columns)
+                    counters['failed'] += 1
+                writer.writerow(row + values)
+                counters['rows'] += 1
+                if checkpoint_file and counters['rows'] % checkpoint_every == 0:
+                    state['input_offset'] = position[0]
+                    state['output_offset'] = output.tell()
+                    write_checkpoint(checkpoint_file, state, output)
+            if checkpoint_file:
+                state['input_offset'] = position[0]
+                state['output_offset'] = output.tell()
+                state['complete'] = True
+                write_checkpoint(checkpoint_file, state, output)
+        finally:
+            output.close()
+    return counters
@@ -0,0 +1,160 @@
+import os, sys, cPickle, tempfile
+from timeit import default_timer
+from address_parser import AddressParser, cwd
+from sqlite_reference import SQLiteReferenceData
+from address import Address
+from profiling import load_slow_inputs
+import wire
+
+sample_addresses = ['2 N. Park Street, Madison, WI 53703', '407 West Doty St. #2', '230 Lakelawn',
+                    '504 W. Washington Ave.', '351 King St. suite 500, San Francisco, CA, 94158',
+                    '416/418 N. Carroll St.', '407 west doty st apt 2', '205 1105 14 90210']
+
+def time_parses(addresses, parser):
+    '''Parse each address once and return (address, seconds) pairs.'''
+    results = []
+    for address in addresses:
+        start = default_timer()
+        Address(address, parser)
+        results.append((address, default_timer() - start))
+    return results
+
+def replay(file_name, parser=None):
+    '''
+    Re-run the inputs dumped by a SlowInputRecorder and report the recorded time next to the time it takes now.
+    '''
+    parser = parser or AddressParser()
+    records = load_slow_inputs(file_name)
+    timed = time_parses([record['address'] for record in records], parser)
+    return [{'address': address, 'recorded': record['timings']['total'], 'seconds': seconds}
+            for record, (address, seconds) in zip(records, timed)]
+
+def distinct_addresses(addresses, count):
+    '''
+    count different addresses made from addresses by giving each one its own house number. Real input rarely
+    repeats, and repeated addresses would let pickle's memo share their strings.
+    '''
+    return ['%d %s' % (number, addresses[number % len(addresses)].split(' ', 1)[1]) for number in range(1, count + 1)]
+
+def wire_formats(addresses=None, parser=None, count=100, chunk_size=1):
+    '''
+    Compare what it costs to send parse results from a worker to its parent: pickling the Address objects,
+    pickling wire.encode tuples, and wire.pack records. Like multiprocessing does, each chunk of chunk_size results
+    is pickled and unpickled on its own (imap's default is one result per chunk), so nothing one chunk pickled is
+    shared with the next through pickle's memo. Returns bytes and seconds (encode plus decode) per record for each,
+    and the bytes of the parser's reference tables that every pickled Address chunk drags along.
+    '''
+    parser = parser or AddressParser()
+    parsed = [Address(address, parser) for address in distinct_addresses(addresses or sample_addresses, count)]
+    chunks = [parsed[index:index + chunk_size] for index in range(0, len(parsed), chunk_size)]
+    formats = [
+        ('pickle Address', lambda chunk: cPickle.dumps(chunk, 2), cPickle.loads),
+        ('pickle wire.encode', lambda chunk: cPickle.dumps([wire.encode(a) for a in chunk], 2),
+                               lambda data: [wire.decode(values) for values in cPickle.loads(data)]),
+        ('wire.pack', lambda chunk: cPickle.dumps([wire.pack(a) for a in chunk], 2),
+                      lambda data: [wire.unpack(record) for record in cPickle.loads(data)]),
+    ]
+    reference_bytes = len(cPickle.dumps(parser.reference, 2))
+    results = []
+    for name, dump, load in formats:
+        size = 0
+        start = default_timer()
+        for chunk in chunks:
+            data = dump(chunk)
+            size += len(data)
+            load(data)
+        seconds = default_timer() - start
+        results.append({'format': name, 'bytes': float(size) / len(parsed), 'seconds': seconds / len(parsed),
+                        'reference_bytes': reference_bytes})
+    return results
+
+def text_modes(addresses=None, repeat=200):
+    '''
+    Compare the default mode, which utf-8 encodes every component as it is set, with native_text mode, for input
+    given as utf-8 bytes (as read from a file) and as unicode. Python 2 has no allocation tracer, so this does
+    not measure allocations. It counts the calls to Address.to_utf8 that hand back a new string rather than the
+    one they were given: encodes in the default mode, and in native_text mode the conversions of reference table
+    values for unicode input. Time per address is taken on a separate pass without the counting in the way.
+    '''
+    lines = (addresses or sample_addresses) * repeat
+    results = []
+    for text_type in (str, unicode):
+        inputs = [line.decode('utf-8') if text_type is unicode else line for line in lines]
+        for native_text in (False, True):
+            parser = AddressParser()
+            parser.native_text = native_text
+            start = default_timer()
+            for line in inputs:
+                Address(line, parser)
+            seconds = default_timer() - start
+            conversions = [0]
+            original = Address.to_utf8
+            def counting_to_utf8(self, item):
+                result = original(self, item)
+                if result is not None and result is not item: conversions[0] += 1
+                return result
+            Address.to_utf8 = counting_to_utf8
+            try:
+                for line in inputs:
+                    Address(line, parser)
+            finally:
+                Address.to_utf8 = original
+            results.append({'mode': 'native_text' if native_text else 'default', 'input': text_type.__name__,
+                            'conversions': float(conversions[0]) / len(inputs),
+                            'seconds': seconds / len(inputs)})
+    return results
+
+def reference_backends(addresses=None, repeat=200, database_file=None):
+    '''
+    Compare the in memory reference data with an SQLite database built from the same files: time to build the
+    parser, approximate bytes held in process after parsing, and time per address.
+    '''
+    addresses = (addresses or sample_addresses) * repeat
+    directory = None
+    if database_file is None:
+        directory = tempfile.mkdtemp()
+        database_file = os.path.join(directory, 'reference.db')
+    SQLiteReferenceData.build(database_file, os.path.join(cwd, 'zipcode.csv'), os.path.join(cwd, 'suffixes.csv'),
+                              os.path.join(cwd, 'cities.csv'))
+    backends = [('in memory', lambda: AddressParser()),
+                ('sqlite', lambda: AddressParser(reference=SQLiteReferenceData(database_file)))]
+    results = []
+    try:
+        for name, make_parser in backends:
+            start = default_timer()
+            parser = make_parser()
+            load_seconds = default_timer() - start
+            start = default_timer()
+            for line in addresses:
+                Address(line, parser)
+            seconds = default_timer() - start
+            results.append({'backend': name, 'load_seconds': load_seconds, 'bytes': parser.reference.memory_size(),
+                            'seconds': seconds / len(addresses)})
+    finally:
+        if directory:
+            os.remove(database_file)
+            os.rmdir(directory)
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == 'replay':
+        for result in replay(sys.argv[2]):
+            print '%(seconds)10.6f %(recorded)10.6f  %(address)r' % result
+    elif len(sys.argv) == 2 and sys.argv[1] == 'wire':
+        results = wire_formats()
+        print 'one record per pickle; the reference tables alone pickle to %d bytes' % results[0]['reference_bytes']
+        for result in results:
+            print '%(format)-20s %(bytes)12.1f bytes %(seconds)12.8fs per record' % result
+    elif len(sys.argv) == 2 and sys.argv[1] == 'text':
+        print 'new strings returned by Address.to_utf8 per address (a count of calls, not of allocations)'
+        for result in text_modes():
+            print '%(mode)-12s %(input)-8s %(conversions)6.1f new strings %(seconds)12.8fs per address' % result
+    elif len(sys.argv) == 2 and sys.argv[1] == 'reference':
+        for result in reference_backends():
+            print '%(backend)-10s load %(load_seconds)8.4fs %(bytes)12d bytes %(seconds)12.8fs per address' % result
+    else:
+        print 'usage: python benchmark.py replay <slow inputs file>'
+        print '       python benchmark.py wire'
+        print '       python benchmark.py text'
+        print '       python benchmark.py reference'
+        sys.exit(1)
@@ -0,0 +1,59 @@
+import json, threading
+from collections import Counter, OrderedDict
+
+class ParseMetrics(object):
+    '''
+    Parse quality counters for long running jobs. Attach one to a parser (parser.metrics = ParseMetrics()) and
+    every Address it produces is counted: how many had issues, left tokens unmatched, fell back on a blind guess
+    for the city or state, and which secondary designator regexes fired. Safe to share between threads; for
+    multiple processes, snapshot each worker and merge the snapshots in the parent.
+    '''
+    counters = ('parsed', 'with_issues', 'with_unmatched', 'blind_guess_city_name', 'blind_guess_state')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        '''Zero every counter.'''
+        with self._lock:
+            self.counts = Counter()
+            self.regexes = Counter()
+    
+    def record(self, address):
+        '''Count a single parsed Address.'''
+        with self._lock:
+            self.counts['parsed'] += 1
+            if address.issues: self.counts['with_issues'] += 1
+            if address.unmatched_list: self.counts['with_unmatched'] += 1
+            for fallback in set(address.fallbacks):
+                self.counts['blind_guess_' + fallback] += 1
+            for regex in address.matched_regexes:
+                self.regexes[regex] += 1
+    
+    def merge(self, snapshot):
+        '''Add the counts from another snapshot, e.g. one sent back by a worker process.'''
+        with self._lock:
+            for name in self.counters:
+                self.counts[name] += snapshot['counts'].get(name, 0)
+            for regex, count in snapshot['secondary_designator_regexes'].items():
+                self.regexes[regex] += count
+    
+    def snapshot(self):
+        '''Consistent copy of the counters, with each one also given as a rate of addresses parsed.'''
+        with self._lock:
+            counts = OrderedDict((name, self.counts[name]) for name in self.counters)
+            regexes = OrderedDict(self.regexes.most_common())
+        parsed = counts['parsed']
+        rates = OrderedDict((name, float(counts[name]) / parsed if parsed else 0.0) for name in self.counters[1:])
+        snapshot = OrderedDict()
+        snapshot['counts'] = counts
+        snapshot['rates'] = rates
+        snapshot['secondary_designator_regexes'] = regexes
+        return snapshot
+    
+    def as_json(self, pretty=False):
+        '''snapshot in json format'''
+        if pretty:
+            return json.dumps(self.snapshot(), indent=4)
+        return json.dumps(self.snapshot())
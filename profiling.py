@@ -0,0 +1,47 @@
+import heapq, itertools, json, threading
+
+class SlowInputRecorder(object):
+    '''
+    Keeps the size slowest inputs seen by Address.__init__, along with how long each parse stage took. Attach one
+    to a parser (parser.slow_inputs = SlowInputRecorder()) and dump it once the run is done; benchmark.replay
+    re-runs the dump so a production outlier becomes a reproducible case.
+    '''
+    def __init__(self, size=100):
+        self.size = size
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+    
+    def record(self, address, timings):
+        '''Offer one parse. Anything faster than the current cut off is dropped without taking the lock.'''
+        total = timings['total']
+        heap = self._heap
+        if len(heap) >= self.size and total <= heap[0][0]:
+            return
+        with self._lock:
+            entry = (total, next(self._counter), address, timings)
+            if len(heap) < self.size:
+                heapq.heappush(heap, entry)
+            elif total > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+    
+    def slowest(self):
+        '''Recorded inputs, slowest first.'''
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [{'address': address, 'timings': timings} for total, count, address, timings in entries]
+    
+    def reset(self):
+        with self._lock:
+            self._heap = []
+    
+    def dump(self, file_name):
+        '''Write the recorded inputs as one json object per line, slowest first.'''
+        with open(file_name, 'w') as f:
+            for record in self.slowest():
+                f.write(json.dumps(record) + '\n')
+
+def load_slow_inputs(file_name):
+    '''Read back a file written by SlowInputRecorder.dump.'''
+    with open(file_name) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,266 @@
+import csv, sys
+
+def read_zips(file_name):
+    '''
+    Builds a zip code dictionary from csv
+    '''
+    zip_codes = {}
+    with open(file_name) as f:
+        for zipcode in csv.DictReader(f, delimiter=','):
+            zip_codes[zipcode['zip']] = {
+                                            'city_name': zipcode['city'],
+                                            'state': zipcode['state']
+                                        }
+    return zip_codes
+
+def read_suffixes(file_name):
+    '''
+    Build the suffix dictionary. The keys will be possible long versions, and the values will be the
+    accepted abbreviations.
+    '''
+    suffixes = {}
+    with open(file_name, 'r') as f:
+        for line in f:
+            # make sure we have key and value
+            if len(line.split(',')) != 2:
+                continue
+            # strip off newlines
+            suffixes[line.strip().split(',')[0]] = line.strip().split(',')[1]
+    return suffixes
+
+def read_names(file_name):
+    '''
+    Load up one name per line in lowercase for easier matching. Used for both cities and streets.
+    '''
+    names = []
+    with open(file_name, 'r') as f:
+        for line in f:
+            names.append(line.strip().lower())
+    return names
+
+readers = {
+    'zip_codes': read_zips,
+    'suffixes': read_suffixes,
+    'cities': read_names,
+    'streets': read_names,
+}
+
+class LayeredSet(object):
+    '''
+    Read-only set that layers a few added and removed names over a shared base set. Nothing from the base is
+    copied, and membership stays O(1) as long as the base is a set.
+    '''
+    def __init__(self, base, added=(), removed=()):
+        self.base = base
+        self.added = frozenset(added)
+        self.removed = frozenset(removed) - self.added
+    
+    def __contains__(self, item):
+        if item in self.added: return True
+        return item not in self.removed and item in self.base
+    
+    def __iter__(self):
+        for item in self.added:
+            yield item
+        for item in self.base:
+            if item not in self.added and item not in self.removed:
+                yield item
+    
+    def __len__(self):
+        return sum(1 for item in self)
+
+class LayeredDict(object):
+    '''
+    Read-only mapping that layers a few added and removed keys over a shared base dict, the dict counterpart
+    of LayeredSet.
+    '''
+    def __init__(self, base, added=None, removed=()):
+        self.base = base
+        self.added = dict(added or {})
+        self.removed = frozenset(removed) - frozenset(self.added)
+    
+    def __contains__(self, key):
+        if key in self.added: return True
+        return key not in self.removed and key in self.base
+    
+    has_key = __contains__
+    
+    def __getitem__(self, key):
+        if key in self.added: return self.added[key]
+        if key in self.removed: raise KeyError(key)
+        return self.base[key]
+    
+    def get(self, key, default=None):
+        if key in self: return self[key]
+        return default
+    
+    def __iter__(self):
+        for key in self.added:
+            yield key
+        for key in self.base:
+            if key not in self.added and key not in self.removed:
+                yield key
+    
+    def __len__(self):
+        return sum(1 for key in self)
+    
+    def keys(self):
+        return list(self)
+    
+    def values(self):
+        return [self[key] for key in self]
+    
+    def items(self):
+        return [(key, self[key]) for key in self]
+    
+    def iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+def as_set(names):
+    '''
+    Cities and streets are only ever used for membership tests, so plain collections are kept in a set. Anything
+    else (layers, database backed tables) already answers membership itself.
+    '''
+    if isinstance(names, (list, tuple, set)): return frozenset(names)
+    return names
+
+def add_names(names, added):
+    '''
+    A set with added names included. In memory sets are copied, layers get the names added to the layer, anything
+    else gets a layer on top.
+    '''
+    if isinstance(names, frozenset): return names | frozenset(added)
+    if isinstance(names, LayeredSet): return LayeredSet(names.base, names.added | frozenset(added), names.removed)
+    return LayeredSet(names, added)
+
+def add_entries(table, added):
+    '''The dict counterpart of add_names.'''
+    if isinstance(table, dict):
+        table = dict(table)
+        table.update(added)
+        return table
+    if isinstance(table, LayeredDict):
+        layer = dict(table.added)
+        layer.update(added)
+        return LayeredDict(table.base, layer, table.removed)
+    return LayeredDict(table, added)
+
+def deep_size(obj, seen=None):
+    '''Rough recursive sys.getsizeof for the dicts, lists and strings that make up reference tables.'''
+    if seen is None: seen = set()
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_size(item, seen)
+    elif isinstance(obj, (LayeredSet, LayeredDict)):
+        # only count the layer, the base belongs to somebody else
+        size += deep_size(obj.added, seen) + deep_size(obj.removed, seen)
+    return size
+
+class ReferenceData(object):
+    '''
+    One generation of the zip codes, suffixes, cities and streets used while parsing. A generation is never
+    mutated once a parser has published it. Reloading builds a whole new generation and swaps it in, so an
+    Address that started on one generation finishes on it.
+    '''
+    tables = ('zip_codes', 'suffixes', 'cities', 'streets')
+
+    def __init__(self, zip_codes=None, suffixes=None, cities=None, streets=None, sources=None, generation=0,
+                 suffix_abbreviations=None, base=None):
+        '''
+        sources maps table names to the files they were read from. Tables without a source were handed to us
+        in memory and are carried over as-is when the generation is reloaded. base is set on overlays and
+        points at the generation they are layered over.
+        '''
+        self.zip_codes = zip_codes if zip_codes is not None else {}
+        self.suffixes = suffixes if suffixes is not None else {}
+        self.cities = as_set(cities if cities is not None else ())
+        self.streets = as_set(streets if streets is not None else ())
+        if suffix_abbreviations is None:
+            suffix_abbreviations = frozenset(self.suffixes.values())
+        self.suffix_abbreviations = suffix_abbreviations
+        self.sources = dict(sources or {})
+        self.generation = generation
+        self.base = base
+        self._table_sizes = None
+
+    @classmethod
+    def load(cls, sources, base=None, generation=0, **tables):
+        '''
+        Build a generation by reading every table named in sources. Tables passed as keywords win over files,
+        anything left over is shared with base.
+        '''
+        for name in cls.tables:
+            if name in tables: continue
+            if sources.get(name):
+                tables[name] = readers[name](sources[name])
+            elif base is not None:
+                tables[name] = getattr(base, name)
+        return cls(sources=sources, generation=generation, **tables)
+
+    def reloaded(self, sources=None):
+        '''Read a fresh copy of this generation from its sources, with any overrides in sources applied.'''
+        merged = dict(self.sources)
+        merged.update(sources or {})
+        return self.load(merged, base=self, generation=self.generation + 1)
+
+    def replace(self, **tables):
+        '''Return the next generation with the given tables swapped out and the rest shared.'''
+        sources = dict(self.sources)
+        for name in self.tables:
+            if name in tables:
+                sources.pop(name, None)
+            else:
+                tables[name] = getattr(self, name)
+        if 'suffixes' not in tables or tables['suffixes'] is self.suffixes:
+            tables['suffix_abbreviations'] = self.suffix_abbreviations
+        return ReferenceData(sources=sources, generation=self.generation + 1, **tables)
+
+    def overlay(self, zip_codes=None, suffixes=None, cities=None, streets=None, remove_zip_codes=(),
+                remove_suffixes=(), remove_cities=(), remove_streets=()):
+        '''
+        Return a generation that layers the given additions and removals over this one without copying it.
+        Cities and streets are lowercased and suffixes uppercased to match what the loaders store.
+        '''
+        suffixes = dict((key.upper(), value.upper()) for key, value in (suffixes or {}).items())
+        remove_suffixes = frozenset(key.upper() for key in remove_suffixes)
+        layered_suffixes = LayeredDict(self.suffixes, suffixes, remove_suffixes)
+        # an abbreviation only goes away once nothing left in the table maps to it
+        dropped = frozenset(self.suffixes[key] for key in remove_suffixes if key in self.suffixes)
+        dropped = dropped - frozenset(layered_suffixes[key] for key in layered_suffixes
+                                      if layered_suffixes[key] in dropped)
+        return ReferenceData(
+            zip_codes=LayeredDict(self.zip_codes, zip_codes, remove_zip_codes),
+            suffixes=layered_suffixes,
+            cities=LayeredSet(self.cities, [c.lower() for c in cities or ()], [c.lower() for c in remove_cities]),
+            streets=LayeredSet(self.streets, [s.lower() for s in streets or ()], [s.lower() for s in remove_streets]),
+            suffix_abbreviations=LayeredSet(self.suffix_abbreviations, suffixes.values(), dropped),
+            generation=self.generation,
+            base=self)
+    
+    def table_sizes(self):
+        '''
+        Approximate bytes held by each table. A published generation never changes, so the walk is only done once.
+        '''
+        if self._table_sizes is None:
+            seen = set()
+            self._table_sizes = dict((name, deep_size(getattr(self, name), seen)) for name in self.tables)
+        return self._table_sizes
+
+    def memory_size(self):
+        '''Approximate bytes held by this generation's tables.'''
+        return sum(self.table_sizes().values())
+
+    def shared_memory_size(self, other):
+        '''Approximate bytes held by this generation and other together, counting tables they share once.'''
+        old_sizes, new_sizes = other.table_sizes(), self.table_sizes()
+        # anything that isn't one of the tables (a provider's caches, say) belongs to this generation alone
+        unshared = [size for name, size in new_sizes.items()
+                    if name not in self.tables or getattr(self, name) is not getattr(other, name)]
+        return sum(old_sizes.values()) + sum(unshared)
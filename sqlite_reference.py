@@ -0,0 +1,236 @@
+import os, sqlite3, threading, weakref
+from reference_data import ReferenceData, LayeredSet, LayeredDict, read_zips, read_suffixes, read_names, deep_size
+
+schema = '''
+create table zip_codes (zip text primary key, city_name text not null, state text not null);
+create table suffixes (name text primary key, abbreviation text not null);
+create index suffixes_abbreviation on suffixes (abbreviation);
+create table cities (name text primary key);
+create table streets (name text primary key);
+'''
+
+def build_database(file_name, zip_file, suffix_file, city_file, street_files=()):
+    '''
+    Build an indexed SQLite reference database from the same files AddressParser loads, plus any number of street
+    files. The database is written next to file_name and renamed over it when complete, so a parser reloading
+    from file_name only ever sees a finished database.
+    '''
+    temp_file = file_name + '.building'
+    if os.path.exists(temp_file): os.remove(temp_file)
+    connection = sqlite3.connect(temp_file)
+    connection.text_factory = str
+    try:
+        connection.executescript(schema)
+        connection.executemany('insert into zip_codes values (?, ?, ?)',
+                               ((zip_code, entry['city_name'], entry['state'])
+                                for zip_code, entry in read_zips(zip_file).iteritems()))
+        connection.executemany('insert into suffixes values (?, ?)', read_suffixes(suffix_file).iteritems())
+        connection.executemany('insert or ignore into cities values (?)', ((name,) for name in read_names(city_file)))
+        for street_file in street_files:
+            connection.executemany('insert or ignore into streets values (?)',
+                                   ((name,) for name in read_names(street_file)))
+        connection.commit()
+    finally:
+        connection.close()
+    os.rename(temp_file, file_name)
+
+missing = object()
+
+class SQLiteTable(object):
+    '''
+    Read-only dict (or set, when there is no value) view of one table, answered by indexed queries. A small
+    cache in front of the queries holds recent lookups, hits and misses both, and is simply emptied once full.
+    '''
+    def __init__(self, database, table, key, columns=(), make_value=None, cache_size=10000):
+        self.database = database
+        self.table = table
+        self.key = key
+        self.make_value = make_value
+        self.cache_size = cache_size
+        self.cache = {}
+        self.lookup_query = 'select %s from %s where %s = ? limit 1' % (', '.join(columns or (key,)), table, key)
+        self.keys_query = 'select distinct %s from %s' % (key, table)
+
+    def lookup(self, key):
+        cache = self.cache
+        row = cache.get(key, missing)
+        if row is missing:
+            row = self.database.connection().execute(self.lookup_query, (key,)).fetchone()
+            if len(cache) >= self.cache_size: cache.clear()
+            cache[key] = row
+        return row
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    has_key = __contains__
+
+    def __getitem__(self, key):
+        row = self.lookup(key)
+        if row is None: raise KeyError(key)
+        return self.make_value(row) if self.make_value else row[0]
+
+    def get(self, key, default=None):
+        if key in self: return self[key]
+        return default
+
+    def __iter__(self):
+        for row in self.database.connection().execute(self.keys_query):
+            yield row[0]
+
+    def __len__(self):
+        return self.database.connection().execute('select count(*) from (%s)' % self.keys_query).fetchone()[0]
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+class OpenConnection(object):
+    '''
+    One thread's connection, with the most its page cache can grow to and the thread it belongs to. sqlite3
+    connections can't be weakly referenced, so this is what the reference data keeps track of.
+    '''
+    def __init__(self, file_name):
+        self.thread = threading.current_thread()
+        self.connection = sqlite3.connect(file_name)
+        self.connection.text_factory = str
+        cache_size = self.connection.execute('pragma cache_size').fetchone()[0]
+        page_size = self.connection.execute('pragma page_size').fetchone()[0]
+        # a negative cache_size is a limit in KiB rather than in pages
+        self.cache_bytes = -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+
+def zip_entry(row):
+    return {'city_name': row[0], 'state': row[1]}
+
+class SQLiteReferenceData(ReferenceData):
+    '''
+    Reference data kept in an SQLite database built by build_database instead of in Python dicts and sets. What
+    lives in the process is the lookup caches and, for each thread, a connection with its own page cache, so
+    memory is bounded by those however big the gazetteer gets. Pass one to AddressParser(reference=...).
+    '''
+    def __init__(self, file_name, cache_size=10000, generation=0, build_sources=None, overrides=None):
+        '''
+        build_sources optionally names the zip_codes, suffixes, cities and streets files the database was built
+        from (streets being a list), so reload can rebuild it with some of them swapped. overrides holds tables
+        set through the parser (load_*, or assigning parser.cities and the like) on an earlier generation; they
+        stay in place over the database across replace and reload.
+        '''
+        self.file_name = file_name
+        self.cache_size = cache_size
+        self.local = threading.local()
+        # every thread's open connection, so memory_size can count their page caches. The thread local slot
+        # holding one can outlive its thread for a while, so the ones whose thread has ended are dropped when counted.
+        self.open_connections = weakref.WeakSet()
+        self.connections_lock = threading.Lock()
+        self.build_sources = dict(build_sources or {})
+        ReferenceData.__init__(
+            self,
+            zip_codes=SQLiteTable(self, 'zip_codes', 'zip', ('city_name', 'state'), zip_entry, cache_size),
+            suffixes=SQLiteTable(self, 'suffixes', 'name', ('abbreviation',), cache_size=cache_size),
+            cities=SQLiteTable(self, 'cities', 'name', cache_size=cache_size),
+            streets=SQLiteTable(self, 'streets', 'name', cache_size=cache_size),
+            suffix_abbreviations=SQLiteTable(self, 'suffixes', 'abbreviation', cache_size=cache_size),
+            sources={'database': file_name},
+            generation=generation)
+        self.overrides = dict(overrides or {})
+        for name, table in self.overrides.items():
+            setattr(self, name, self.rebased(name, table))
+        if 'suffixes' in self.overrides:
+            suffixes = self.suffixes
+            if isinstance(suffixes, LayeredDict) and isinstance(suffixes.base, SQLiteTable):
+                self.suffix_abbreviations = LayeredSet(self.suffix_abbreviations, suffixes.added.values(),
+                                                       [suffixes.base[key] for key in suffixes.removed])
+            else:
+                self.suffix_abbreviations = frozenset(suffixes.values())
+
+    def rebased(self, name, table):
+        '''
+        load_* layers additions over a generation's database table; move such a layer onto this generation's table
+        so it doesn't keep answering from an old connection and cache. Other tables are kept as they were given.
+        '''
+        if isinstance(table, LayeredSet) and isinstance(table.base, SQLiteTable):
+            return LayeredSet(getattr(self, name), table.added, table.removed)
+        if isinstance(table, LayeredDict) and isinstance(table.base, SQLiteTable):
+            return LayeredDict(getattr(self, name), table.added, table.removed)
+        if name in ('cities', 'streets') and isinstance(table, (list, tuple, set)):
+            return frozenset(table)
+        return table
+
+    @classmethod
+    def build(cls, file_name, zip_file, suffix_file, city_file, street_files=(), cache_size=10000):
+        '''build_database, then open it, remembering the files so reload can rebuild it.'''
+        build_database(file_name, zip_file, suffix_file, city_file, street_files)
+        build_sources = {'zip_codes': zip_file, 'suffixes': suffix_file, 'cities': city_file,
+                         'streets': list(street_files)}
+        return cls(file_name, cache_size, build_sources=build_sources)
+
+    def connection(self):
+        opened = getattr(self.local, 'opened', None)
+        if opened is None:
+            opened = self.local.opened = OpenConnection(self.file_name)
+            with self.connections_lock:
+                self.open_connections.add(opened)
+        return opened.connection
+
+    def __getstate__(self):
+        # connections and caches stay behind; a process that unpickles us opens its own
+        return {'file_name': self.file_name, 'cache_size': self.cache_size, 'generation': self.generation,
+                'build_sources': self.build_sources, 'overrides': self.overrides}
+
+    def __setstate__(self, state):
+        self.__init__(state['file_name'], state['cache_size'], state['generation'], state['build_sources'],
+                      state['overrides'])
+
+    def replace(self, **tables):
+        '''The next generation on the same database, with the given tables kept over it.'''
+        overrides = dict(self.overrides)
+        overrides.update(tables)
+        return SQLiteReferenceData(self.file_name, self.cache_size, self.generation + 1, self.build_sources,
+                                   overrides)
+
+    def reloaded(self, sources=None):
+        '''
+        Open the database again as the next generation. If sources name new files, the database is rebuilt from
+        them (and the files it was built from) first, and any override of those tables is dropped.
+        '''
+        build_sources = dict(self.build_sources)
+        for name, file_name in (sources or {}).items():
+            build_sources[name] = [file_name] if name == 'streets' else file_name
+        if sources:
+            if not all(build_sources.get(name) for name in ('zip_codes', 'suffixes', 'cities')):
+                raise ValueError('%s was not built from files, it can only be reopened' % self.file_name)
+            build_database(self.file_name, build_sources['zip_codes'], build_sources['suffixes'],
+                           build_sources['cities'], build_sources.get('streets', ()))
+        overrides = dict((name, table) for name, table in self.overrides.items() if name not in (sources or {}))
+        return SQLiteReferenceData(self.file_name, self.cache_size, self.generation + 1, build_sources, overrides)
+
+    def table_sizes(self):
+        '''
+        Approximate bytes held in process per table: the lookup cache in front of each query plus any layer or
+        override kept over it. 'connections' is the page cache budget of the connection of every thread still
+        running that has used this generation, which is what SQLite may hold for them at most, not what it holds
+        right now. Not cached like the in memory
+        tables, since the lookup caches keep filling and threads come and go.
+        '''
+        seen = set()
+        sizes = {}
+        for name in self.tables + ('suffix_abbreviations',):
+            table = getattr(self, name)
+            size = deep_size(table, seen)
+            view = table.base if isinstance(table, (LayeredSet, LayeredDict)) else table
+            if isinstance(view, SQLiteTable): size += deep_size(view.cache, seen)
+            sizes[name] = size
+        with self.connections_lock:
+            for opened in [opened for opened in self.open_connections if not opened.thread.is_alive()]:
+                self.open_connections.discard(opened)
+            sizes['connections'] = sum(opened.cache_bytes for opened in self.open_connections)
+        return sizes
@@ -0,0 +1,110 @@
+import unittest
+import sys, os, csv, shutil, tempfile, json
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from batch import normalize_csv, CheckpointError
+
+addresses = ['2 N. Park Street, Madison, WI 53703', '407 West Doty St. #2', '230 Lakelawn', '504 W. Washington Ave.',
+             '351 King St. suite 500, San Francisco, CA, 94158', '416/418 N. Carroll St.', '407 west doty st apt 2']
+
+class Interrupted(KeyboardInterrupt): pass
+
+class InterruptAfter(object):
+    '''Stands in for parser metrics and kills the run after a number of addresses, like a worker dying.'''
+    def __init__(self, count):
+        self.count = count
+    
+    def record(self, address):
+        self.count -= 1
+        if self.count < 0: raise Interrupted()
+
+class BatchTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.input_file = self.path('input.csv')
+        with open(self.input_file, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'address'])
+            for number, address in enumerate(addresses * 3):
+                writer.writerow([number, address])
+    
+    def path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def read(self, name):
+        with open(self.path(name), 'rb') as f:
+            return f.read()
+    
+    def test_normalize(self):
+        counters = normalize_csv(self.input_file, self.path('out.csv'), self.parser)
+        self.assertEqual(21, counters['rows'])
+        lines = self.read('out.csv').splitlines()
+        self.assertEqual('id,address,primary_number', lines[0][:len('id,address,primary_number')])
+        self.assertTrue(lines[1].startswith('0,"2 N. Park Street, Madison, WI 53703",2,N.,Park,'))
+    
+    def test_resume_is_byte_identical(self):
+        expected = normalize_csv(self.input_file, self.path('expected.csv'), self.parser)
+        checkpoint = self.path('checkpoint.json')
+        self.parser.metrics = InterruptAfter(9)
+        self.assertRaises(Interrupted, normalize_csv, self.input_file, self.path('out.csv'), self.parser,
+                          checkpoint_file=checkpoint, checkpoint_every=4)
+        state = json.load(open(checkpoint))
+        self.assertEqual(8, state['counters']['rows'])
+        self.assertFalse(state.get('complete'))
+        self.parser.metrics = None
+        counters = normalize_csv(self.input_file, self.path('out.csv'), self.parser, checkpoint_file=checkpoint,
+                                 checkpoint_every=4)
+        self.assertEqual(expected, counters)
+        self.assertEqual(self.read('expected.csv'), self.read('out.csv'))
+        self.assertTrue(json.load(open(checkpoint))['complete'])
+    
+    def interrupted_run(self):
+        checkpoint = self.path('checkpoint.json')
+        self.parser.metrics = InterruptAfter(5)
+        self.assertRaises(Interrupted, normalize_csv, self.input_file, self.path('out.csv'), self.parser,
+                          checkpoint_file=checkpoint, checkpoint_every=4)
+        self.parser.metrics = None
+        return checkpoint
+    
+    def test_checkpoint_for_other_input(self):
+        checkpoint = self.interrupted_run()
+        other = self.path('other.csv')
+        shutil.copy(self.input_file, other)
+        self.assertRaises(CheckpointError, normalize_csv, other, self.path('out.csv'), self.parser,
+                          checkpoint_file=checkpoint)
+    
+    def test_checkpoint_for_changed_input(self):
+        checkpoint = self.interrupted_run()
+        with open(self.input_file, 'ab') as f:
+            f.write('99,1 Main St\r\n')
+        self.assertRaises(CheckpointError, normalize_csv, self.input_file, self.path('out.csv'), self.parser,
+                          checkpoint_file=checkpoint)
+    
+    def test_checkpoint_for_other_output_or_column(self):
+        checkpoint = self.interrupted_run()
+        self.assertRaises(CheckpointError, normalize_csv, self.input_file, self.path('elsewhere.csv'), self.parser,
+                          checkpoint_file=checkpoint)
+        self.assertRaises(CheckpointError, normalize_csv, self.input_file, self.path('out.csv'), self.parser,
+                          column='id', checkpoint_file=checkpoint)
+    
+    def test_checkpoint_with_missing_output(self):
+        checkpoint = self.interrupted_run()
+        os.remove(self.path('out.csv'))
+        self.assertRaises(CheckpointError, normalize_csv, self.input_file, self.path('out.csv'), self.parser,
+                          checkpoint_file=checkpoint)
+    
+    def test_rerun_after_completion_is_a_no_op(self):
+        checkpoint = self.path('checkpoint.json')
+        normalize_csv(self.input_file, self.path('out.csv'), self.parser, checkpoint_file=checkpoint)
+        before = self.read('out.csv')
+        counters = normalize_csv(self.input_file, self.path('out.csv'), self.parser, checkpoint_file=checkpoint)
+        self.assertEqual(21, counters['rows'])
+        self.assertEqual(before, self.read('out.csv'))
+    
+
+if __name__ == '__main__':
+    unittest.main()
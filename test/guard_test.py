@@ -0,0 +1,64 @@
+import unittest
+import sys, os
+from timeit import default_timer
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+from metrics import ParseMetrics
+
+class GuardTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+    
+    def assertBounded(self, address, seconds=0.25):
+        start = default_timer()
+        addr = Address(address, self.parser)
+        self.assertTrue(default_timer() - start < seconds)
+        self.assertTrue(addr.guarded)
+        self.assertTrue('Input exceeded parse limits and was truncated' in addr.issues)
+        return addr
+    
+    def test_normal_address_is_not_guarded(self):
+        addr = Address('2 N. Park Street, Madison, WI 53703', self.parser)
+        self.assertFalse(addr.guarded)
+        self.assertEqual('Park', addr.street_name)
+    
+    def test_long_word(self):
+        self.assertBounded('a' * 100000)
+    
+    def test_long_word_inside_address(self):
+        addr = self.assertBounded('407 West Doty St. ' + 'x' * 100000 + ' #2')
+        self.assertEqual('407', addr.primary_number)
+        self.assertEqual('Doty', addr.street_name)
+    
+    def test_many_tokens(self):
+        self.assertBounded('ab ' * 50000)
+    
+    def test_many_hash_and_dash_tokens(self):
+        self.assertBounded('# - ' * 50000)
+        self.assertBounded('#1-a ' * 50000)
+    
+    def test_floor_and_units_patterns(self):
+        self.assertBounded('1' * 50000 + 'floor')
+        self.assertBounded('1 main st ' + 'x ' * 50000 + 'units')
+    
+    def test_guarded_to_nothing_is_still_counted(self):
+        self.parser.metrics = ParseMetrics()
+        addr = self.assertBounded('a' * 100000)
+        self.assertEqual('Street name could not be determined', addr.issues[-1])
+        counts = self.parser.metrics.snapshot()['counts']
+        self.assertEqual(1, counts['parsed'])
+        self.assertEqual(1, counts['with_issues'])
+    
+    def test_limits_are_configurable(self):
+        self.parser.max_tokens = 4
+        addr = Address('407 West Doty St. #2', self.parser)
+        self.assertTrue(addr.guarded)
+        self.assertEqual('407', addr.primary_number)
+        self.assertEqual(None, addr.secondary_number)
+    
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys, os, json, threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+from metrics import ParseMetrics
+
+class ParseMetricsTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+        self.parser.metrics = ParseMetrics()
+    
+    def test_counts_parsed_addresses(self):
+        Address('2 N. Park Street, Madison, WI 53703', self.parser)
+        Address('407 West Doty St. #2', self.parser)
+        counts = self.parser.metrics.snapshot()['counts']
+        self.assertEqual(2, counts['parsed'])
+        self.assertEqual(0, counts['with_issues'])
+    
+    def test_counts_blind_guess_fallbacks(self):
+        Address('205 1105 14 90210', self.parser)
+        counts = self.parser.metrics.snapshot()['counts']
+        self.assertEqual(1, counts['blind_guess_state'])
+        self.assertEqual(1, counts['blind_guess_city_name'])
+    
+    def test_counts_secondary_designator_regexes(self):
+        Address('407 west doty st apt 2', self.parser)
+        regexes = self.parser.metrics.snapshot()['secondary_designator_regexes']
+        self.assertEqual(1, regexes[r'apt #{0,1}\w+'])
+    
+    def test_issues_are_per_address(self):
+        Address('230 Lakelawn', self.parser)
+        addr = Address('2 N. Park Street, Madison, WI 53703', self.parser)
+        self.assertEqual([], addr.issues)
+    
+    def test_reset_and_json(self):
+        Address('230 Lakelawn', self.parser)
+        self.parser.metrics.reset()
+        self.assertEqual(0, json.loads(self.parser.metrics.as_json())['counts']['parsed'])
+    
+    def test_merge_and_threads(self):
+        def work():
+            for i in range(20):
+                Address('407 West Doty St. #2', self.parser)
+        threads = [threading.Thread(target=work) for i in range(4)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        total = ParseMetrics()
+        total.merge(self.parser.metrics.snapshot())
+        total.merge(self.parser.metrics.snapshot())
+        self.assertEqual(80, self.parser.metrics.snapshot()['counts']['parsed'])
+        self.assertEqual(160, total.snapshot()['counts']['parsed'])
+    
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+
+class NativeTextTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+        self.parser.native_text = True
+    
+    def test_utf8_bytes_stay_bytes(self):
+        addr = Address('12 Caf\xc3\xa9 Ave, Madison, WI 53703', self.parser)
+        self.assertEqual('Caf\xc3\xa9', addr.street_name)
+        self.assertEqual('12 Caf\xc3\xa9 Ave, Madison, WI 53703', addr.original)
+        for value in addr.components().values():
+            self.assertTrue(value is None or type(value) is str)
+    
+    def test_unicode_stays_unicode(self):
+        addr = Address(u'12 Caf\xe9 Ave, Madison, WI 53703', self.parser)
+        self.assertEqual(u'Caf\xe9', addr.street_name)
+        self.assertEqual(u'Ave.', addr.street_suffix)
+        for value in addr.components().values():
+            self.assertTrue(value is None or type(value) is unicode)
+        # a two word city found by zip code is trusted over the single word city token
+        addr = Address(u'100 madison ca 90210', self.parser)
+        self.assertEqual(u'Beverly Hills', addr.city_name)
+        self.assertTrue('city_name' in addr.fallbacks)
+        for value in addr.components().values():
+            self.assertTrue(value is None or type(value) is unicode)
+    
+    def test_same_result_as_default_mode(self):
+        address = '351 King St. suite 500, San Francisco, CA, 94158'
+        self.assertEqual(Address(address, AddressParser()).as_dict(), Address(address, self.parser).as_dict())
+    
+    def test_plus4_zip(self):
+        addr = Address('2 N. Park Street, Madison, WI 53703-1234', self.parser)
+        self.assertEqual('53703', addr.zip_code)
+        self.assertEqual('1234', addr.plus4_code)
+    
+
+if __name__ == '__main__':
+    unittest.main()
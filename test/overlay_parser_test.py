@@ -0,0 +1,74 @@
+import unittest
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+from metrics import ParseMetrics
+
+class OverlayParserTest(unittest.TestCase):
+    base = None
+    
+    def setUp(self):
+        self.base = AddressParser()
+    
+    def test_added_and_removed_cities(self):
+        tenant = self.base.overlay(cities=['Gotham'], remove_cities=['madison'])
+        self.assertTrue('gotham' in tenant.cities)
+        self.assertFalse('madison' in tenant.cities)
+        self.assertTrue('wisconsin rapids' in tenant.cities)
+        self.assertFalse('gotham' in self.base.cities)
+        self.assertTrue('madison' in self.base.cities)
+    
+    def test_overlay_shares_base_tables(self):
+        tenant = self.base.overlay(cities=['gotham'])
+        self.assertTrue(tenant.cities.base is self.base.cities)
+        self.assertTrue(tenant.reference.memory_size() < self.base.reference.memory_size() / 100)
+    
+    def test_added_suffix(self):
+        tenant = self.base.overlay(suffixes={'promenade': 'prom'})
+        addr = Address('12 Ocean Promenade', tenant)
+        self.assertEqual('Prom.', addr.street_suffix)
+        self.assertEqual('Ocean', addr.street_name)
+        self.assertTrue('PROM' in tenant.reference.suffix_abbreviations)
+        self.assertFalse('PROMENADE' in self.base.suffixes)
+    
+    def test_removed_suffix_keeps_shared_abbreviation(self):
+        tenant = self.base.overlay(remove_suffixes=['ALLEY'])
+        self.assertFalse('ALLEY' in tenant.suffixes)
+        self.assertTrue('ALY' in tenant.reference.suffix_abbreviations)
+    
+    def test_tables_cannot_be_assigned(self):
+        tenant = self.base.overlay(cities=['gotham'])
+        for name in ('suffixes', 'cities', 'streets'):
+            self.assertRaises(AttributeError, setattr, tenant, name, [])
+        self.assertTrue('gotham' in tenant.cities)
+    
+    def test_settings_follow_base(self):
+        self.base.metrics = ParseMetrics()
+        self.base.max_tokens = 4
+        tenant = self.base.overlay(cities=['gotham'])
+        addr = Address('407 West Doty St. #2', tenant)
+        self.assertTrue(addr.guarded)
+        self.assertEqual(1, self.base.metrics.snapshot()['counts']['parsed'])
+    
+    def test_settings_set_on_overlay(self):
+        self.base.metrics = ParseMetrics()
+        tenant = self.base.overlay()
+        tenant.metrics = ParseMetrics()
+        tenant.native_text = True
+        Address(u'407 West Doty St. #2', tenant)
+        self.assertEqual(1, tenant.metrics.snapshot()['counts']['parsed'])
+        self.assertEqual(0, self.base.metrics.snapshot()['counts']['parsed'])
+        self.assertFalse(self.base.native_text)
+    
+    def test_overlay_follows_base_reload(self):
+        tenant = self.base.overlay(cities=['gotham'])
+        old = tenant.reference
+        self.base.reload()
+        self.assertTrue(tenant.reference is not old)
+        self.assertTrue(tenant.reference.base is self.base.reference)
+        self.assertTrue('gotham' in tenant.cities)
+    
+
+if __name__ == '__main__':
+    unittest.main()
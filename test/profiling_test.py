@@ -0,0 +1,51 @@
+import unittest
+import sys, os, tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+from profiling import SlowInputRecorder, load_slow_inputs
+from benchmark import replay
+
+class SlowInputRecorderTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+        self.parser.slow_inputs = SlowInputRecorder(size=2)
+    
+    def test_keeps_slowest(self):
+        recorder = SlowInputRecorder(size=2)
+        for address, total in [('a', 0.1), ('b', 0.5), ('c', 0.3), ('d', 0.05)]:
+            recorder.record(address, {'total': total})
+        self.assertEqual(['b', 'c'], [record['address'] for record in recorder.slowest()])
+    
+    def test_records_stage_timings(self):
+        Address('407 West Doty St. #2', self.parser)
+        records = self.parser.slow_inputs.slowest()
+        self.assertEqual(1, len(records))
+        self.assertEqual('407 West Doty St. #2', records[0]['address'])
+        self.assertEqual(set(['guard', 'preprocess', 'parse', 'total']), set(records[0]['timings']))
+    
+    def test_records_input_before_guard(self):
+        address = '407 West Doty St. ' + 'x' * 1000 + ' #2'
+        Address(address, self.parser)
+        Address('a' * 100000, self.parser)
+        records = self.parser.slow_inputs.slowest()
+        self.assertEqual(set([address, 'a' * 100000]), set(record['address'] for record in records))
+    
+    def test_dump_and_replay(self):
+        Address('407 West Doty St. #2', self.parser)
+        Address('2 N. Park Street, Madison, WI 53703', self.parser)
+        Address('230 Lakelawn', self.parser)
+        handle, file_name = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, file_name)
+        self.parser.slow_inputs.dump(file_name)
+        self.assertEqual(2, len(load_slow_inputs(file_name)))
+        results = replay(file_name, self.parser)
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(result['seconds'] >= 0 for result in results))
+    
+
+if __name__ == '__main__':
+    unittest.main()
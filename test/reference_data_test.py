@@ -0,0 +1,70 @@
+import unittest
+import sys, os, tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+
+class ReferenceDataTest(unittest.TestCase):
+    ap = None
+    
+    def setUp(self):
+        self.ap = AddressParser()
+    
+    def write_cities(self, *cities):
+        handle, file_name = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write('\n'.join(cities) + '\n')
+        self.addCleanup(os.remove, file_name)
+        return file_name
+    
+    def test_parsers_do_not_share_tables(self):
+        other = AddressParser(cities=['madison'])
+        self.assertEqual(frozenset(['madison']), other.cities)
+        self.assertTrue('wisconsin rapids' in self.ap.cities)
+    
+    def test_reload_swaps_generation(self):
+        old = self.ap.reference
+        stats = self.ap.reload(city_file=self.write_cities('gotham'))
+        self.assertEqual(old.generation + 1, stats['generation'])
+        self.assertTrue('gotham' in self.ap.cities)
+        self.assertFalse('gotham' in old.cities)
+        self.assertTrue(old.zip_codes is not self.ap.zip_codes)
+        # streets has no file, so it is the one table carried over
+        streets = self.ap.reference.table_sizes()['streets']
+        self.assertEqual(stats['old_bytes'] + stats['new_bytes'] - streets, stats['overlap_bytes'])
+    
+    def test_overlap_counts_carried_over_tables_once(self):
+        parser = AddressParser(cities=['madison', 'beloit'])
+        stats = parser.reload()
+        sizes = parser.reference.table_sizes()
+        self.assertTrue(sizes['cities'] > 0)
+        shared = sizes['cities'] + sizes['streets']
+        self.assertEqual(stats['old_bytes'] + stats['new_bytes'] - shared, stats['overlap_bytes'])
+    
+    def test_reload_without_memory_accounting(self):
+        stats = self.ap.reload(measure_memory=False)
+        self.assertEqual(set(['generation', 'seconds']), set(stats))
+    
+    def test_in_flight_address_keeps_generation(self):
+        addr = Address(None, self.ap)
+        self.ap.reload(city_file=self.write_cities('gotham'))
+        self.assertFalse('gotham' in addr.reference.cities)
+        self.assertTrue('madison' in addr.reference.cities)
+    
+    def test_load_cities_does_not_mutate_published_generation(self):
+        old = self.ap.reference
+        self.ap.load_cities(self.write_cities('gotham'))
+        self.assertFalse('gotham' in old.cities)
+        self.assertTrue('gotham' in self.ap.cities)
+        self.assertTrue('madison' in self.ap.cities)
+    
+    def test_reload_in_background(self):
+        results = []
+        thread = self.ap.reload_in_background(results.append, city_file=self.write_cities('gotham'))
+        thread.join()
+        self.assertEqual(1, len(results))
+        self.assertTrue('gotham' in self.ap.cities)
+    
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import sys, os, shutil, tempfile, threading, cPickle
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser, cwd
+from address import Address
+from sqlite_reference import SQLiteReferenceData, SQLiteTable, build_database
+
+class SQLiteReferenceDataTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.streets_file = os.path.join(self.directory, 'streets.csv')
+        with open(self.streets_file, 'w') as f:
+            f.write('lakelawn\n')
+        self.reference = SQLiteReferenceData.build(os.path.join(self.directory, 'reference.db'),
+                                                   os.path.join(cwd, 'zipcode.csv'),
+                                                   os.path.join(cwd, 'suffixes.csv'),
+                                                   os.path.join(cwd, 'cities.csv'), [self.streets_file])
+        self.parser = AddressParser(reference=self.reference)
+    
+    def test_lookups(self):
+        self.assertTrue(self.parser.zip_codes.has_key('00210'))
+        self.assertEqual('Portsmouth', self.parser.zip_codes['00211']['city_name'])
+        self.assertEqual('ALY', self.parser.suffixes['ALLEY'])
+        self.assertTrue('ALY' in self.parser.reference.suffix_abbreviations)
+        self.assertTrue('wisconsin rapids' in self.parser.cities)
+        self.assertFalse('gotham' in self.parser.cities)
+        self.assertTrue('lakelawn' in self.parser.streets)
+    
+    def test_same_parse_as_in_memory(self):
+        in_memory = AddressParser()
+        for address in ['2 N. Park Street, Madison, WI 53703', '205 1105 14 90210', '407 west doty st apt 2',
+                        '111-123 Unit St providence RI 02909']:
+            self.assertEqual(Address(address, in_memory).as_dict(), Address(address, self.parser).as_dict())
+    
+    def test_memory_counts_page_cache_per_connection(self):
+        self.assertEqual(0, self.reference.table_sizes()['connections'])
+        Address('2 N. Park Street, Madison, WI 53703', self.parser)
+        connection = self.reference.connection()
+        cache_size = connection.execute('pragma cache_size').fetchone()[0]
+        page_size = connection.execute('pragma page_size').fetchone()[0]
+        budget = -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+        self.assertEqual(budget, self.reference.table_sizes()['connections'])
+        self.assertTrue(self.reference.memory_size() > budget)
+        counted = []
+        def parse_in_thread():
+            Address('407 west doty st apt 2', self.parser)
+            counted.append(self.reference.table_sizes()['connections'])
+        thread = threading.Thread(target=parse_in_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual([2 * budget], counted)
+        # once the other thread has finished its connection isn't counted, whenever its thread local goes away
+        self.assertEqual(budget, self.reference.table_sizes()['connections'])
+        self.assertTrue(self.reference.memory_size() < AddressParser().reference.memory_size() / 5)
+    
+    def test_cache_is_bounded(self):
+        cities = self.reference.cities
+        cities.cache_size = 3
+        for city in ['madison', 'gotham', 'beloit', 'verona', 'janesville']:
+            city in cities
+        self.assertTrue(len(cities.cache) <= 3)
+    
+    def test_reload_rebuilds_database(self):
+        cities_file = os.path.join(self.directory, 'cities.csv')
+        with open(cities_file, 'w') as f:
+            f.write('gotham\n')
+        stats = self.parser.reload(city_file=cities_file)
+        self.assertEqual(1, stats['generation'])
+        self.assertTrue('gotham' in self.parser.cities)
+        self.assertFalse('madison' in self.parser.cities)
+        self.assertTrue('lakelawn' in self.parser.streets)
+    
+    def test_load_keeps_sqlite_backend(self):
+        streets_file = os.path.join(self.directory, 'more_streets.csv')
+        with open(streets_file, 'w') as f:
+            f.write('doty\n')
+        self.parser.load_streets(streets_file)
+        self.parser.load_streets(self.streets_file)
+        self.assertTrue(isinstance(self.parser.reference, SQLiteReferenceData))
+        self.assertTrue('doty' in self.parser.streets)
+        self.assertTrue('lakelawn' in self.parser.streets)
+        self.assertTrue(isinstance(self.parser.streets.base, SQLiteTable))
+    
+    def test_reload_after_load_reopens_database(self):
+        streets_file = os.path.join(self.directory, 'more_streets.csv')
+        with open(streets_file, 'w') as f:
+            f.write('doty\n')
+        self.parser.load_streets(streets_file)
+        self.assertTrue('madison' in self.parser.cities)
+        cities_file = os.path.join(self.directory, 'cities.csv')
+        with open(cities_file, 'w') as f:
+            f.write('gotham\n')
+        build_database(self.reference.file_name, os.path.join(cwd, 'zipcode.csv'), os.path.join(cwd, 'suffixes.csv'),
+                       cities_file)
+        self.parser.reload()
+        self.assertTrue(isinstance(self.parser.reference, SQLiteReferenceData))
+        self.assertFalse('madison' in self.parser.cities)
+        self.assertTrue('gotham' in self.parser.cities)
+        # the loaded street layer now sits on the new database, which was built without the street file
+        self.assertTrue('doty' in self.parser.streets)
+        self.assertFalse('lakelawn' in self.parser.streets)
+    
+    def test_reload_city_file_after_load_keeps_sqlite_backend(self):
+        suffixes_file = os.path.join(self.directory, 'suffixes.csv')
+        with open(suffixes_file, 'w') as f:
+            f.write('PROMENADE,PROM\n')
+        self.parser.load_suffixes(suffixes_file)
+        self.assertEqual('PROM', self.parser.suffixes['PROMENADE'])
+        self.assertTrue('PROM' in self.parser.reference.suffix_abbreviations)
+        self.assertTrue('ALY' in self.parser.reference.suffix_abbreviations)
+        cities_file = os.path.join(self.directory, 'cities.csv')
+        with open(cities_file, 'w') as f:
+            f.write('gotham\n')
+        self.parser.reload(city_file=cities_file)
+        self.assertTrue(isinstance(self.parser.reference, SQLiteReferenceData))
+        self.assertTrue(isinstance(self.parser.cities, SQLiteTable))
+        self.assertTrue('gotham' in self.parser.cities)
+        self.assertEqual('PROM', self.parser.suffixes['PROMENADE'])
+    
+    def test_overlay(self):
+        tenant = self.parser.overlay(cities=['gotham'], remove_cities=['madison'])
+        self.assertTrue('gotham' in tenant.cities)
+        self.assertFalse('madison' in tenant.cities)
+        self.assertTrue('beloit' in tenant.cities)
+    
+    def test_pickle(self):
+        parser = cPickle.loads(cPickle.dumps(self.parser, 2))
+        self.assertEqual('ALY', parser.suffixes['ALLEY'])
+    
+
+if __name__ == '__main__':
+    unittest.main()
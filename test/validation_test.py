@@ -0,0 +1,60 @@
+import unittest
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+from validation import ConsistencyValidator
+
+class ConsistencyValidatorTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+        self.validator = ConsistencyValidator(self.parser)
+    
+    def test_consistent_address(self):
+        addr = Address('2 N. Park Street, Madison, WI 53703', self.parser)
+        self.assertEqual(None, self.validator.validate(addr))
+        self.assertEqual(1, self.validator.counts['consistent'])
+    
+    def test_no_zip_is_skipped(self):
+        self.assertEqual(None, self.validator.validate({'city_name': 'Madison', 'state_abbreviation': 'WI'}))
+        self.assertEqual(1, self.validator.counts['skipped'])
+    
+    def test_city_mismatch(self):
+        mismatch = self.validator.validate({'zip_code': '90210', 'city_name': 'Madison', 'state_abbreviation': 'CA'})
+        self.assertEqual(['zip_code_city_mismatch'], mismatch['problems'])
+        self.assertEqual('Beverly Hills', mismatch['suggestions']['city_name'])
+    
+    def test_state_mismatch_suggests_zip_codes(self):
+        mismatch = self.validator.validate({'zip_code': '90210', 'city_name': 'Madison', 'state_abbreviation': 'WI'})
+        self.assertEqual(['zip_code_state_mismatch', 'zip_code_city_mismatch'], mismatch['problems'])
+        self.assertEqual('CA', mismatch['suggestions']['state_abbreviation'])
+        self.assertTrue('53703' in mismatch['suggestions']['zip_code'])
+        self.assertTrue(len(mismatch['suggestions']['zip_code']) <= ConsistencyValidator.max_suggestions)
+    
+    def test_unknown_zip(self):
+        mismatch = self.validator.validate({'zip_code': '00000', 'city_name': 'Madison', 'state_abbreviation': 'WI'})
+        self.assertEqual(['unknown_zip_code'], mismatch['problems'])
+    
+    def test_mismatches_stream(self):
+        records = [{'zip_code': '53703', 'city_name': 'Madison', 'state_abbreviation': 'WI'},
+                   {'zip_code': '90210', 'city_name': 'Madison', 'state_abbreviation': 'WI'},
+                   {'zip_code': '53703', 'city_name': 'madison', 'state_abbreviation': 'wi'}]
+        self.assertEqual([1], [number for number, mismatch in self.validator.mismatches(iter(records))])
+    
+    def test_index_checks_zip_codes_against_a_set(self):
+        zip_codes, suggested = self.validator.index()[1][('madison', 'WI')]
+        self.assertTrue(isinstance(zip_codes, frozenset))
+        self.assertTrue('53703' in zip_codes)
+        self.assertEqual(tuple(sorted(zip_codes)), suggested)
+    
+    def test_index_follows_reload(self):
+        first = self.validator.index()[1]
+        self.assertTrue(self.validator.index()[1] is first)
+        self.parser.reload()
+        self.assertTrue(self.validator.index()[1] is not first)
+    
+
+if __name__ == '__main__':
+    unittest.main()
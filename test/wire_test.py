@@ -0,0 +1,54 @@
+import unittest
+import sys, os, cPickle
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from address_parser import AddressParser
+from address import Address
+import wire
+
+class WireTest(unittest.TestCase):
+    parser = None
+    
+    def setUp(self):
+        self.parser = AddressParser()
+        self.addr = Address('351 King St. suite 500, San Francisco, CA, 94158', self.parser)
+    
+    def test_encode_round_trip(self):
+        parsed = wire.decode(cPickle.loads(cPickle.dumps(wire.encode(self.addr), 2)))
+        self.assertEqual(self.addr.components(), parsed.components())
+        self.assertEqual(self.addr.delivery_line, parsed.delivery_line)
+        self.assertEqual(self.addr.delivery_line2, parsed.delivery_line2)
+        self.assertEqual(self.addr.last_line, parsed.last_line)
+        self.assertEqual(tuple(self.addr.issues), parsed.issues)
+    
+    def test_pack_round_trip(self):
+        parsed = wire.unpack(wire.pack(self.addr))
+        self.assertEqual(wire.decode(wire.encode(self.addr)), parsed)
+        self.assertEqual('San Francisco', parsed.city_name)
+        self.assertEqual(None, parsed.plus4_code)
+    
+    def test_pack_issues(self):
+        addr = Address('Lakelawn', self.parser)
+        parsed = wire.unpack(wire.pack(addr))
+        self.assertEqual(tuple(addr.issues), parsed.issues)
+        self.assertTrue(len(parsed.issues) > 0)
+    
+    def test_pack_field_too_long(self):
+        parsed = wire.decode(wire.encode(self.addr))
+        self.assertEqual('x' * 65534, wire.unpack(wire.pack(parsed._replace(street_name='x' * 65534))).street_name)
+        for length in (65535, 70000):
+            try:
+                wire.pack(parsed._replace(street_name='x' * length))
+                self.fail('packed a %d byte field' % length)
+            except ValueError as error:
+                self.assertTrue('street_name' in str(error))
+    
+    def test_encoded_strings_are_interned(self):
+        other = Address('2 N. Park Street, San Francisco, CA 94158', self.parser)
+        self.assertTrue(wire.encode(self.addr)[7] is wire.encode(other)[7])
+    
+    def test_much_smaller_than_pickled_address(self):
+        self.assertTrue(len(wire.pack(self.addr)) * 10 < len(cPickle.dumps(self.addr, 2)))
+    
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+from collections import Counter, OrderedDict
+
+class ConsistencyValidator(object):
+    '''
+    Checks that a parsed address's zip_code belongs to its city_name and state_abbreviation, using the zip codes
+    loaded into a parser. The zip to city/state table is the parser's own, the city/state to zips index is built
+    once per reference generation, so checking a record is a couple of dict lookups however big the tables get.
+    '''
+    # how many candidate zip codes to suggest for a city and state
+    max_suggestions = 5
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.counts = Counter()
+        self._indexed = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        '''
+        Returns (reference, city/state index) for the parser's current generation, rebuilding the index when the
+        parser has reloaded.
+        '''
+        reference = self.parser.reference
+        indexed = self._indexed
+        if indexed is None or indexed[0] is not reference:
+            with self._lock:
+                indexed = self._indexed
+                if indexed is None or indexed[0] is not reference:
+                    by_city = {}
+                    for zip_code, entry in reference.zip_codes.iteritems():
+                        by_city.setdefault((entry['city_name'].lower(), entry['state']), []).append(zip_code)
+                    # a set to check a zip against, and the zips in order to suggest from
+                    for key in by_city:
+                        by_city[key] = (frozenset(by_city[key]), tuple(sorted(by_city[key])))
+                    indexed = self._indexed = (reference, by_city)
+        return indexed
+
+    def validate(self, record):
+        '''
+        Checks one record, which can be an Address, a wire.ParsedAddress or a dict with zip_code, city_name and
+        state_abbreviation. Returns None when the record is consistent or has no zip code to check, otherwise a
+        dict of the problems found and suggested corrections.
+        '''
+        if isinstance(record, dict):
+            zip_code, city, state = record.get('zip_code'), record.get('city_name'), record.get('state_abbreviation')
+        else:
+            zip_code, city, state = record.zip_code, record.city_name, record.state_abbreviation
+        self.counts['checked'] += 1
+        if not zip_code:
+            self.counts['skipped'] += 1
+            return None
+        reference, by_city = self.index()
+        city_key = city.lower() if city else None
+        state_key = state.upper() if state else None
+        candidates, suggested = by_city.get((city_key, state_key), (frozenset(), ()))
+        problems = []
+        suggestions = OrderedDict()
+        entry = reference.zip_codes.get(zip_code)
+        if entry is None:
+            problems.append('unknown_zip_code')
+        else:
+            if state_key and entry['state'] != state_key:
+                problems.append('zip_code_state_mismatch')
+                suggestions['state_abbreviation'] = entry['state']
+            # zipcode.csv has one city per zip; the zip is still fine if it's listed under our city and state
+            if city_key and entry['city_name'].lower() != city_key and zip_code not in candidates:
+                problems.append('zip_code_city_mismatch')
+                suggestions['city_name'] = entry['city_name']
+        if not problems:
+            self.counts['consistent'] += 1
+            return None
+        if suggested:
+            suggestions['zip_code'] = list(suggested[:self.max_suggestions])
+        self.counts['mismatched'] += 1
+        for problem in problems:
+            self.counts[problem] += 1
+        mismatch = OrderedDict()
+        mismatch['zip_code'] = zip_code
+        mismatch['city_name'] = city
+        mismatch['state_abbreviation'] = state
+        mismatch['problems'] = problems
+        mismatch['suggestions'] = suggestions
+        return mismatch
+
+    def mismatches(self, records):
+        '''Streams over records, yielding (record number, mismatch) for each one that fails validate.'''
+        for number, record in enumerate(records):
+            mismatch = self.validate(record)
+            if mismatch is not None:
+                yield number, mismatch
@@ -0,0 +1,75 @@
+import struct
+from collections import namedtuple, OrderedDict
+
+# Fixed field order for parse results sent between processes. The components come first, in the same order as
+# Address.components().
+component_fields = ('primary_number', 'street_predirection', 'street_name', 'street_postdirection', 'street_suffix',
+                    'secondary_number', 'secondary_designator', 'city_name', 'state_abbreviation', 'zip_code',
+                    'plus4_code')
+fields = component_fields + ('delivery_line', 'delivery_line2', 'last_line', 'issues')
+
+class ParsedAddress(namedtuple('ParsedAddress', fields)):
+    '''
+    A parse result without the parser, blind guesses or other parsing state attached, cheap to pickle or pack.
+    issues is a tuple of strings.
+    '''
+    __slots__ = ()
+    
+    def components(self):
+        '''dict of components, matching Address.components'''
+        return OrderedDict((name, getattr(self, name)) for name in component_fields)
+
+def maybe_intern(value):
+    # intern() only takes byte strings; interned values are shared by pickle's memo and in the parent
+    if type(value) is str: return intern(value)
+    return value
+
+def encode(address):
+    '''Fixed order tuple of an Address's results with the strings interned.'''
+    values = [maybe_intern(getattr(address, name)) for name in fields[:-1]]
+    values.append(tuple(maybe_intern(issue) for issue in address.issues))
+    return tuple(values)
+
+def decode(values):
+    '''ParsedAddress from a tuple made by encode.'''
+    return ParsedAddress._make(maybe_intern(value) for value in values)
+
+# packed records are a sequence of fields, each a 2 byte length and that many utf-8 bytes, none_length for None
+length_format = struct.Struct('>H')
+none_length = 0xFFFF
+
+def pack(address):
+    '''
+    Pack an Address (or ParsedAddress) into a byte string. Issues are packed as one newline separated field. A field
+    of none_length bytes or more raises ValueError.
+    '''
+    parts = []
+    for name in fields:
+        value = getattr(address, name)
+        if name == 'issues':
+            value = '\n'.join(value) if value else None
+        if value is None:
+            parts.append(length_format.pack(none_length))
+            continue
+        if type(value) is unicode:
+            value = value.encode('utf-8')
+        if len(value) >= none_length:
+            raise ValueError('%s is %d bytes, too long to pack (the limit is %d)' % (name, len(value), none_length - 1))
+        parts.append(length_format.pack(len(value)))
+        parts.append(value)
+    return ''.join(parts)
+
+def unpack(record):
+    '''ParsedAddress from a byte string made by pack.'''
+    values = []
+    offset = 0
+    for name in fields:
+        length, = length_format.unpack_from(record, offset)
+        offset += length_format.size
+        if length == none_length:
+            values.append(None)
+            continue
+        values.append(intern(record[offset:offset + length]))
+        offset += length
+    values[-1] = tuple(values[-1].split('\n')) if values[-1] else ()
+    return ParsedAddress._make(values)